@@ -1,12 +1,19 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import io
+import re
 from google.cloud import bigquery
 import requests
-from datetime import datetime
-import time
+from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
+from utils.rate_limiter import AdaptiveRateLimiter
+from utils.http_session import create_session, rate_limited_get, RESPONSE_CACHE_NAME
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables
 load_dotenv()
@@ -17,104 +24,208 @@ SERANKING_API_KEY = os.getenv("SERANKING_API_KEY")
 PROJECT_ID = os.getenv("GCP_PROJECT_ID")
 DATASET_NAME = os.getenv("BIGQUERY_DATASET")
 
+# SE Ranking keyword fields and the column names we store them under
+KEYWORD_COLUMNS = {
+    "keyword": "Keyword",
+    "position": "Position",
+    "prev_pos": "Previous_Position",
+    "volume": "Search_Volume",
+    "cpc": "CPC",
+    "competition": "Competition",
+    "url": "URL",
+    "traffic": "Traffic",
+    "price": "Traffic_Cost",
+}
+
+# Compact dtypes for the integer keyword columns, only the previous position can be
+# missing (keywords that weren't ranking before), other missing values count as 0
+KEYWORD_DTYPES = {
+    "Position": np.int16,
+    "Previous_Position": pd.Int16Dtype(),
+    "Search_Volume": np.int32,
+    "Traffic": np.int32,
+}
+
+MAX_CONCURRENT_PAGES = 8  # Page requests in flight per domain, still paced by _api_limiter()
+BIGQUERY_MIN_LOAD_ROWS = 50_000  # Rows buffered before a background load job is started
+BIGQUERY_LOAD_CHUNK_ROWS = 1_000_000  # Keep load jobs large, BigQuery caps table modifications per day
+
+@st.cache_resource
+def _api_limiter() -> AdaptiveRateLimiter:
+    """Limiter shared by all requests and reruns, follows the rate limit headers SE Ranking returns"""
+    return AdaptiveRateLimiter(calls_per_second=1)
+
+@st.cache_resource
+def _se_session():
+    """Keep-alive connection pool and response cache shared by all SE Ranking requests and reruns"""
+    return create_session(cache_name=RESPONSE_CACHE_NAME)
+
 def make_api_request(endpoint, params=None, max_retries=3):
-    """Make an API request to SE Ranking with retry logic."""
+    """Make a rate-limited API request to SE Ranking, transient errors are retried by the session."""
     headers = {
         "Authorization": f"Bearer {SERANKING_API_KEY}",
         "Content-Type": "application/json"
     }
     url = f"{BASE_URL}/{endpoint}"
+    api_limiter = _api_limiter()
     
     for attempt in range(max_retries):
+        response = None
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = rate_limited_get(_se_session(), api_limiter, url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            if attempt == max_retries - 1:
-                st.error(f"API request failed: {str(e)}")
-                raise
-            time.sleep(2 ** attempt)  # Exponential backoff
+            if response is not None and response.status_code == 429 and attempt < max_retries - 1:
+                api_limiter.penalize(int(response.headers.get("Retry-After", 60)))
+                continue
+            raise
 
-def fetch_domain_data(domain: str, progress_bar=None) -> pd.DataFrame:
-    """Fetch keyword data for a domain with pagination."""
-    all_data = []
-    page = 1
-    total_pages = 1
+@st.cache_data(ttl=timedelta(hours=24), show_spinner=False)
+def fetch_keyword_pages(domain: str, month: str) -> pd.DataFrame:
+    """Fetch all keyword pages for a domain, cached per domain and month.
     
-    while page <= total_pages:
+    Nothing in here may touch Streamlit elements, cached results are replayed
+    without running the function. The month is only used as part of the key.
+    """
+    def fetch_page(page):
         params = {
             "domain": domain,
             "type": "organic",
             "limit": 1000,
             "page": page,
-            "cols": "keyword,position,prev_pos,volume,cpc,competition,url,traffic,price"
+            "cols": ",".join(KEYWORD_COLUMNS)
         }
-        
         try:
-            response_data = make_api_request("us/keywords/", params)
-            if page == 1:
-                total_pages = (response_data.get("total", 0) + 999) // 1000
-                if progress_bar:
-                    progress_bar.total = total_pages
-            
-            keywords = response_data.get("keywords", [])
-            if not keywords:
-                break
-                
-            for kw in keywords:
-                kw["domain"] = domain
-                kw["date"] = datetime.now().strftime("%Y-%m")
-            
-            all_data.extend(keywords)
-            if progress_bar:
-                progress_bar.progress(page / total_pages)
-            
-            page += 1
-            time.sleep(1)  # Rate limiting
-            
+            return make_api_request("us/keywords/", params)
         except Exception as e:
-            st.error(f"Error fetching data for {domain} on page {page}: {str(e)}")
-            break
+            raise Exception(f"page {page}: {str(e)}") from e
     
-    if not all_data:
+    # The first page tells us the total, the remaining pages are requested concurrently
+    first_page = fetch_page(1)
+    pages = [first_page]
+    total_pages = (first_page.get("total", 0) + 999) // 1000
+    if first_page.get("keywords") and total_pages > 1:
+        with ThreadPoolExecutor(max_workers=min(total_pages - 1, MAX_CONCURRENT_PAGES)) as executor:
+            pages.extend(executor.map(fetch_page, range(2, total_pages + 1)))
+    
+    columns = {field: [] for field in KEYWORD_COLUMNS}
+    for response_data in pages:
+        keywords = response_data.get("keywords", [])
+        for field, values in columns.items():
+            values.extend(kw.get(field) for kw in keywords)
+    
+    if not columns["keyword"]:
         return pd.DataFrame()
     
-    df = pd.DataFrame(all_data)
-    df = df.rename(columns={
-        "keyword": "Keyword",
-        "volume": "Search_Volume",
-        "position": "Position",
-        "prev_pos": "Previous_Position",
-        "cpc": "CPC",
-        "competition": "Competition",
-        "url": "URL",
-        "traffic": "Traffic",
-        "price": "Traffic_Cost",
-        "domain": "Competitor"
-    })
+    df = pd.DataFrame({KEYWORD_COLUMNS[field]: values for field, values in columns.items()})
+    for column, dtype in KEYWORD_DTYPES.items():
+        values = pd.to_numeric(df[column], errors="coerce")
+        if not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            values = values.fillna(0)
+        df[column] = values.astype(dtype)
+    df["Competitor"] = domain
     
     return df
 
-def save_to_bigquery(df: pd.DataFrame, table_name: str):
-    """Save DataFrame to BigQuery."""
+def fetch_domain_data(domain: str, progress_bar=None) -> pd.DataFrame:
+    """Fetch keyword data for a domain, reusing this month's cached fetch if there is one."""
+    month = datetime.now().strftime("%Y-%m")
+    
     try:
-        client = bigquery.Client(project=PROJECT_ID)
-        table_id = f"{PROJECT_ID}.{DATASET_NAME}.{table_name}"
-        
-        # Configure the load job
-        job_config = bigquery.LoadJobConfig(
-            write_disposition="WRITE_APPEND",
-        )
-        
-        # Load the data
-        job = client.load_table_from_dataframe(df, table_id, job_config=job_config)
-        job.result()  # Wait for the job to complete
-        
-        st.success(f"Successfully saved {len(df)} rows to BigQuery table {table_id}")
-        
+        df = fetch_keyword_pages(domain, month)
     except Exception as e:
-        st.error(f"Error saving to BigQuery: {str(e)}")
+        st.error(f"Error fetching data for {domain} on {str(e)}")
+        return pd.DataFrame()
+    
+    if progress_bar:
+        progress_bar.progress(1.0)
+    
+    if df.empty:
+        return df
+    return df.assign(date=month)
+
+def flag_branded(keywords: pd.Series, branded_terms: str) -> np.ndarray:
+    """Flag (1/0) keywords that contain any of the comma-separated branded terms, ignoring case."""
+    terms = sorted({term.strip() for term in branded_terms.split(",") if term.strip()})
+    if not terms:
+        return np.zeros(len(keywords), dtype=np.int8)
+    
+    # Match the terms literally as one alternation with Arrow's RE2 engine over the whole column
+    pattern = "|".join(re.sub(r"([\\.^$|?*+()\[\]{}])", r"\\\1", term) for term in terms)
+    matches = pc.match_substring_regex(
+        pa.array(keywords, type=pa.string(), from_pandas=True), pattern, ignore_case=True)
+    return matches.fill_null(False).to_numpy(zero_copy_only=False).astype(np.int8)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def dataframe_to_csv(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame to CSV bytes with Arrow's multithreaded CSV writer."""
+    buffer = io.BytesIO()
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    return buffer.getvalue()
+
+def bigquery_table_id(table_name: str) -> str:
+    return f"{PROJECT_ID}.{DATASET_NAME}.{table_name}"
+
+def load_to_bigquery(df: pd.DataFrame, table_name: str):
+    """Append a DataFrame to a BigQuery table, raising on failure."""
+    client = bigquery.Client(project=PROJECT_ID)
+    table_id = bigquery_table_id(table_name)
+    
+    # Configure the load job
+    job_config = bigquery.LoadJobConfig(
+        write_disposition="WRITE_APPEND",
+        source_format=bigquery.SourceFormat.PARQUET,
+    )
+    
+    def load_chunk(chunk):
+        job = client.load_table_from_dataframe(chunk, table_id, job_config=job_config)
+        return job.result()  # Wait for the job to complete
+    
+    # Load the data, very large frames are split into concurrent load jobs
+    chunks = [df.iloc[start:start + BIGQUERY_LOAD_CHUNK_ROWS]
+              for start in range(0, len(df), BIGQUERY_LOAD_CHUNK_ROWS)]
+    with ThreadPoolExecutor(max_workers=max(1, len(chunks))) as executor:
+        list(executor.map(load_chunk, chunks))
+
+class BigQueryBatchWriter:
+    """Load DataFrames into a BigQuery table in the background as they arrive.
+    
+    Frames are buffered until at least min_rows are waiting, which keeps the
+    number of load jobs well under BigQuery's daily per-table limit while the
+    upload overlaps with fetching the next domain.
+    """
+    def __init__(self, table_name: str, min_rows: int = BIGQUERY_MIN_LOAD_ROWS):
+        self.table_name = table_name
+        self.min_rows = min_rows
+        self.rows_saved = 0
+        self._pending = []
+        self._pending_rows = 0
+        self._jobs = []
+        self._executor = ThreadPoolExecutor(max_workers=1)
+    
+    def add(self, df: pd.DataFrame):
+        self._pending.append(df)
+        self._pending_rows += len(df)
+        if self._pending_rows >= self.min_rows:
+            self._submit()
+    
+    def _submit(self):
+        if not self._pending:
+            return
+        batch = pd.concat(self._pending, ignore_index=True)
+        self._pending, self._pending_rows = [], 0
+        self._jobs.append((len(batch), self._executor.submit(load_to_bigquery, batch, self.table_name)))
+    
+    def close(self):
+        """Load whatever is still buffered and wait for all load jobs, raising the first failure."""
+        try:
+            self._submit()
+            for rows, job in self._jobs:
+                job.result()
+                self.rows_saved += rows
+        finally:
+            self._executor.shutdown()
 
 def main():
     st.set_page_config(page_title="Market Opportunity Engine", page_icon="📊", layout="wide")
@@ -143,6 +254,9 @@ def main():
         competitor_list = [domain] + [c.strip() for c in competitors.split('\n') if c.strip()]
         all_data = []
         
+        # Each domain is saved to BigQuery in the background while the next one is fetched
+        bigquery_writer = BigQueryBatchWriter("moe_raw_data")
+        
         # Create a progress container
         progress_container = st.container()
         
@@ -152,39 +266,42 @@ def main():
                 progress_bar = st.progress(0)
                 df = fetch_domain_data(comp, progress_bar)
                 if not df.empty:
+                    # Add branded flag
+                    df['Branded'] = flag_branded(df['Keyword'], branded_terms)
+                    bigquery_writer.add(df)
                     all_data.append(df)
                     st.success(f"Successfully fetched {len(df)} keywords for {comp}")
                 progress_bar.empty()
         
+        # Wait for the remaining BigQuery loads
+        try:
+            bigquery_writer.close()
+            if bigquery_writer.rows_saved:
+                st.success(f"Successfully saved {bigquery_writer.rows_saved} rows to BigQuery table "
+                           f"{bigquery_table_id(bigquery_writer.table_name)}")
+        except Exception as e:
+            st.error(f"Error saving to BigQuery: {str(e)}")
+        
         if all_data:
             # Combine all data
             final_df = pd.concat(all_data, ignore_index=True)
             
-            # Add branded flag
-            if branded_terms:
-                branded_patterns = '|'.join(term.strip() for term in branded_terms.split(','))
-                final_df['Branded'] = final_df['Keyword'].str.contains(
-                    branded_patterns, case=False, regex=True).astype(int)
-            else:
-                final_df['Branded'] = 0
-            
-            # Save to BigQuery
-            save_to_bigquery(final_df, "moe_raw_data")
-            
             # Display summary
             st.subheader("Analysis Summary")
             
+            total_keywords = len(final_df)
+            total_traffic = final_df['Traffic'].sum()
+            total_value = final_df['Traffic_Cost'].sum()
+            
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                st.metric("Total Keywords", len(final_df))
+                st.metric("Total Keywords", total_keywords)
                 
             with col2:
-                total_traffic = final_df['Traffic'].sum()
                 st.metric("Total Traffic", f"{total_traffic:,.0f}")
                 
             with col3:
-                total_value = final_df['Traffic_Cost'].sum()
                 st.metric("Total Traffic Value", f"${total_value:,.2f}")
             
             # Show data preview
@@ -192,10 +309,9 @@ def main():
             st.dataframe(final_df.head(100))
             
             # Download link
-            csv = final_df.to_csv(index=False)
             st.download_button(
                 label="Download Full Data as CSV",
-                data=csv,
+                data=dataframe_to_csv(final_df),
                 file_name="market_opportunity_data.csv",
                 mime="text/csv"
             )
@@ -4,51 +4,108 @@ import numpy as np
 from typing import List, Dict
 import requests
 from datetime import datetime
-import time
 from dotenv import load_dotenv
-from utils.rate_limiter import rate_limit, RateLimiter
+from utils.rate_limiter import AdaptiveRateLimiter
+from utils.http_session import create_session, rate_limited_get, RESPONSE_CACHE_NAME
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import reduce
 
 load_dotenv()
 
+# SE Ranking API endpoints
+BASE_URL = "https://api4.seranking.com/research"
+KEYWORDS_PER_PAGE = 1000
+MAX_KEYWORD_PAGES = 10  # Limit to first 10 pages for now to avoid long processing times
+MAX_CONCURRENT_REQUESTS = 8
+
+# Keep-alive connection pool and response cache shared by all SE Ranking requests
+SESSION = create_session(pool_size=MAX_CONCURRENT_REQUESTS * MAX_CONCURRENT_REQUESTS, cache_name=RESPONSE_CACHE_NAME)
+
 # Initialize rate limiters
-research_limiter = RateLimiter(calls_per_second=1)  # 1 request per second for research API
+research_limiter = AdaptiveRateLimiter(calls_per_second=1)  # 1 request per second for research API until told otherwise
+
+# Opportunity score weights
+VOLUME_WEIGHT = 0.3
+POSITION_WEIGHT = 0.25
+DIFFICULTY_WEIGHT = 0.25
+CPC_WEIGHT = 0.2
+HIGH_OPPORTUNITY_SCORE = 0.7
 
-@rate_limit(calls_per_second=1)
-def make_api_request(url, headers=None, params=None, retries=3, delay=1):
-    """Make a rate-limited API request with retries"""
-    response = None
+def make_api_request(url, headers=None, params=None, retries=3, force_refresh=False):
+    """Make a rate-limited API request, connection and server errors are retried by the session"""
     for attempt in range(retries):
+        response = None
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = rate_limited_get(SESSION, research_limiter, url, force_refresh=force_refresh,
+                                        headers=headers, params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            if response is not None and response.status_code == 429:  # Rate limit exceeded
+            if response is not None and response.status_code == 429 and attempt < retries - 1:  # Rate limit exceeded
                 retry_after = int(response.headers.get('Retry-After', 60))
-                time.sleep(retry_after)
+                research_limiter.penalize(retry_after)
                 continue
             
-            if attempt == retries - 1:  # Last attempt
-                error_msg = str(e)
-                if response is not None:
-                    error_msg = f"HTTP {response.status_code}: {response.text}"
-                raise Exception(f"API request failed after {retries} attempts: {error_msg}")
-            
-            # Exponential backoff for other errors
-            time.sleep(delay * (2 ** attempt))
+            error_msg = str(e)
+            if response is not None:
+                error_msg = f"HTTP {response.status_code}: {response.text}"
+            raise Exception(f"API request failed: {error_msg}")
+
+def fetch_keyword_page(domain: str, page: int, headers: Dict, force_refresh: bool = False) -> Dict:
+    """
+    Fetch a single page of organic keywords for a domain
+    """
+    keyword_params = {
+        "domain": domain,
+        "type": "organic",
+        "limit": KEYWORDS_PER_PAGE,
+        "page": page,
+        "cols": "keyword,position,prev_pos,volume,cpc,competition,url,traffic,price"
+    }
+    
+    keyword_response = make_api_request(
+        f"{BASE_URL}/us/keywords/",
+        headers=headers,
+        params=keyword_params,
+        force_refresh=force_refresh
+    )
+    return keyword_response
+
+def extract_keyword_rows(keyword_response) -> List[Dict]:
+    """
+    Get the keyword rows from a page response, which might be under a different key
+    """
+    # Check if we got valid data
+    if not isinstance(keyword_response, dict):
+        print(f"Error: Expected dictionary response, got {type(keyword_response)}")
+        return []
+    
+    if 'rows' in keyword_response:
+        return keyword_response['rows'] or []
+    elif 'data' in keyword_response:
+        return keyword_response['data'] or []
+    elif 'keywords' in keyword_response:
+        return keyword_response['keywords'] or []
+    
+    print("Available keys in response:", list(keyword_response.keys()))
+    return []
+
+def numeric_column(values: list, dtype) -> np.ndarray:
+    """
+    Convert raw API values to a numeric array of the given dtype, missing or malformed values become 0
+    """
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').fillna(0).to_numpy(dtype=dtype)
 
-def fetch_domain_keywords(domain: str) -> pd.DataFrame:
+def fetch_domain_keywords(domain: str, force_refresh: bool = False) -> pd.DataFrame:
     """
-    Fetch keyword data for a domain using SE Ranking API
+    Fetch keyword data for a domain using SE Ranking API, bypassing the
+    response cache when force_refresh is set
     """
     api_key = os.getenv('SE_RANKING_API_KEY')
     if not api_key:
         raise ValueError("SE Ranking API key not found in environment variables")
     
-    # SE Ranking API endpoints
-    base_url = "https://api4.seranking.com/research"
-    
     # Headers for all requests
     headers = {
         "Authorization": api_key,
@@ -56,142 +113,151 @@ def fetch_domain_keywords(domain: str) -> pd.DataFrame:
     }
     
     try:
-        # Get domain keywords with pagination
-        keywords = []
-        page = 1
-        while True:
-            keyword_params = {
-                "domain": domain,
-                "type": "organic",
-                "limit": 1000,
-                "page": page,
-                "cols": "keyword,position,prev_pos,volume,cpc,competition,url,traffic,price"
-            }
-            
-            keyword_response = make_api_request(
-                f"{base_url}/us/keywords/",
-                headers=headers,
-                params=keyword_params
-            )
-            
-            print(f"\nKeyword Response Page {page}:", json.dumps(keyword_response, indent=2))
-            
-            # Check if we got valid data
-            if not isinstance(keyword_response, dict):
-                print(f"Error: Expected dictionary response, got {type(keyword_response)}")
-                break
-                
-            # Get the rows data, which might be under a different key
-            rows = None
-            if 'rows' in keyword_response:
-                rows = keyword_response['rows']
-            elif 'data' in keyword_response:
-                rows = keyword_response['data']
-            elif 'keywords' in keyword_response:
-                rows = keyword_response['keywords']
-            else:
-                print("Available keys in response:", list(keyword_response.keys()))
-                break
-            
-            if not rows:
-                break
-                
+        # The first page tells us how many pages there are in total
+        first_response = fetch_keyword_page(domain, 1, headers, force_refresh)
+        pages = [extract_keyword_rows(first_response)]
+        total = first_response.get('total') if isinstance(first_response, dict) else None
+        
+        if pages[0] and total:
+            # Remaining pages are independent, so request them concurrently
+            last_page = min((int(total) + KEYWORDS_PER_PAGE - 1) // KEYWORDS_PER_PAGE, MAX_KEYWORD_PAGES)
+            with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+                responses = executor.map(
+                    lambda page: fetch_keyword_page(domain, page, headers, force_refresh),
+                    range(2, last_page + 1)
+                )
+                pages.extend(extract_keyword_rows(response) for response in responses)
+        else:
+            # Total unknown, walk the pages until we get an empty one
+            page = 2
+            while pages[-1] and page <= MAX_KEYWORD_PAGES:
+                pages.append(extract_keyword_rows(fetch_keyword_page(domain, page, headers, force_refresh)))
+                page += 1
+        
+        # Collect each output column directly from the API rows
+        keyword_col, volume_col, position_col, traffic_col, difficulty_col, cpc_col = [], [], [], [], [], []
+        for rows in pages:
             # Process each keyword row
             for row in rows:
                 try:
                     # Try to find the correct keys by printing the first row
-                    if len(keywords) == 0:
+                    if not keyword_col:
                         print("\nSample Row Data:", json.dumps(row, indent=2))
                     
                     # Extract data with multiple possible key names
-                    keyword_data = {
-                        'keyword': row.get('keyword', row.get('term', row.get('query', ''))),
-                        'position': row.get('position', row.get('rank', row.get('serp_position', 0))),
-                        'volume': row.get('volume', row.get('search_volume', row.get('monthly_searches', 0))),
-                        'cpc': row.get('cpc', row.get('cost_per_click', row.get('average_cpc', 0.0))),
-                        'competition': row.get('competition', row.get('difficulty', row.get('keyword_difficulty', 0))),
-                        'url': row.get('url', row.get('landing_page', row.get('page_url', ''))),
-                        'traffic': row.get('traffic', row.get('visits', row.get('estimated_visits', 0))),
-                        'price': row.get('price', row.get('cost', row.get('estimated_cost', 0.0)))
-                    }
-                    keywords.append(keyword_data)
+                    keyword = row.get('keyword', row.get('term', row.get('query', '')))
+                    position = row.get('position', row.get('rank', row.get('serp_position', 0)))
+                    volume = row.get('volume', row.get('search_volume', row.get('monthly_searches', 0)))
+                    cpc = row.get('cpc', row.get('cost_per_click', row.get('average_cpc', 0.0)))
+                    competition = row.get('competition', row.get('difficulty', row.get('keyword_difficulty', 0)))
+                    traffic = row.get('traffic', row.get('visits', row.get('estimated_visits', 0)))
                 except Exception as e:
                     print(f"Error processing row: {e}")
                     print("Row data:", row)
                     continue
-            
-            page += 1
-            
-            # Limit to first 10 pages for now to avoid long processing times
-            if page > 10:
-                break
-        
-        # Process the rankings data into a DataFrame
-        keywords_data = []
-        for keyword in keywords:
-            keyword_info = {
-                'keyword': keyword.get('keyword', ''),
-                'search_volume': keyword.get('volume', 0),
-                'position': keyword.get('position', 0),
-                'traffic': keyword.get('traffic', 0),
-                'difficulty': keyword.get('competition', 0),
-                'cpc': keyword.get('cpc', 0.0)
-            }
-            keywords_data.append(keyword_info)
+                
+                keyword_col.append(keyword)
+                volume_col.append(volume)
+                position_col.append(position)
+                traffic_col.append(traffic)
+                difficulty_col.append(competition)
+                cpc_col.append(cpc)
         
-        return pd.DataFrame(keywords_data)
+        # Process the rankings data into a DataFrame, built column by column with compact dtypes
+        return pd.DataFrame({
+            'keyword': np.asarray(keyword_col, dtype=object),
+            'search_volume': numeric_column(volume_col, np.int32),
+            'position': numeric_column(position_col, np.int16),
+            'traffic': numeric_column(traffic_col, np.int32),
+            'difficulty': numeric_column(difficulty_col, np.float32),
+            'cpc': numeric_column(cpc_col, np.float32)
+        })
         
     except requests.exceptions.RequestException as e:
         raise Exception(f"Error fetching data from SE Ranking API: {str(e)}")
 
-def calculate_opportunity_score(row: pd.Series) -> float:
+def combine_domain_frames(frames: List[pd.DataFrame], domains: List[str]) -> pd.DataFrame:
     """
-    Calculate opportunity score based on keyword metrics
+    Stack same-schema keyword frames column by column and tag each row with its domain
     """
-    volume_weight = 0.3
-    position_weight = 0.25
-    difficulty_weight = 0.25
-    cpc_weight = 0.2
+    # One allocation and copy per column instead of going through pd.concat
+    combined = {
+        column: np.concatenate([frame[column].to_numpy() for frame in frames])
+        for column in frames[0].columns
+    }
     
-    # Normalize values between 0 and 1
-    volume_score = np.log1p(row['search_volume']) / 10  # log scale for volume
-    position_score = (100 - row['position']) / 100  # higher positions are better
-    difficulty_score = (100 - row['difficulty']) / 100  # lower difficulty is better
-    cpc_score = np.minimum(row['cpc'] / 5, 1)  # cap at $5 CPC
+    # Domains are a small repeated set of strings so store them as categories
+    categories = list(dict.fromkeys(domains))
+    codes = np.repeat([categories.index(domain) for domain in domains], [len(frame) for frame in frames])
+    combined['domain'] = pd.Categorical.from_codes(codes, categories=categories)
     
-    return (volume_score * volume_weight +
-            position_score * position_weight +
-            difficulty_score * difficulty_weight +
-            cpc_score * cpc_weight)
+    return pd.DataFrame(combined)
 
-def analyze_market_opportunity(prospect_domain: str, competitor_domains: List[str], progress_callback=None) -> Dict:
+def top_records(df: pd.DataFrame, scores: np.ndarray, n: int = 10) -> List[Dict]:
     """
-    Analyze market opportunity by comparing prospect domain with competitors
+    Return the n highest scoring rows as records, like nlargest but using a partial sort
+    """
+    valid = ~np.isnan(scores)
+    if np.count_nonzero(valid) > n:
+        # Find the n-th largest score in O(N), then keep every row reaching it so
+        # ties are resolved by row order like nlargest(keep='first')
+        kth = np.partition(scores[valid], -n)[-n]
+        candidates = np.flatnonzero(valid & (scores >= kth))
+    else:
+        candidates = np.flatnonzero(valid)
+    top = candidates[np.argsort(-scores[candidates], kind='stable')][:n]
+    return df.iloc[top].to_dict('records')
+
+def analyze_market_opportunity(prospect_domain: str, competitor_domains: List[str], progress_callback=None,
+                               force_refresh: bool = False) -> Dict:
+    """
+    Analyze market opportunity by comparing prospect domain with competitors,
+    force_refresh fetches every page from the API instead of the response cache
     """
-    # Fetch data for all domains
-    prospect_data = fetch_domain_keywords(prospect_domain)
-    prospect_data['domain'] = prospect_domain
-    
     if progress_callback:
-        progress_callback(0.1, "Fetching competitor data...")
+        progress_callback(0.1, "Fetching prospect and competitor data...")
     
-    all_data = [prospect_data]
-    for domain in competitor_domains:
-        comp_data = fetch_domain_keywords(domain)
-        comp_data['domain'] = domain
-        all_data.append(comp_data)
+    # Fetch data for all domains concurrently under the shared rate limiter,
+    # reporting progress from this thread as each domain finishes
+    domains = [prospect_domain] + competitor_domains
+    all_data = [None] * len(domains)
+    executor = ThreadPoolExecutor(max_workers=min(len(domains), MAX_CONCURRENT_REQUESTS))
+    futures = {executor.submit(fetch_domain_keywords, domain, force_refresh): i for i, domain in enumerate(domains)}
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            all_data[i] = future.result()
+            if progress_callback:
+                progress_callback(0.1 + 0.2 * done / len(domains),
+                                  f"Fetched {domains[i]} ({done}/{len(domains)})")
+    except BaseException:
+        # Fail as soon as one domain fails: drop the domains not started yet
+        # and don't wait for the ones in flight (cancel_futures needs 3.9)
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+        raise
+    executor.shutdown()
     
     if progress_callback:
         progress_callback(0.3, "Combining data...")
     
     # Combine all data
-    combined_df = pd.concat(all_data, ignore_index=True)
+    combined_df = combine_domain_frames(all_data, domains)
     
     if progress_callback:
         progress_callback(0.4, "Calculating opportunity scores...")
     
-    # Calculate opportunity scores
-    combined_df['opportunity_score'] = combined_df.apply(calculate_opportunity_score, axis=1)
+    # Calculate opportunity scores (vectorized over whole columns, in float32)
+    volume_score = np.log1p(combined_df['search_volume'].to_numpy(dtype=np.float32)) / 10  # log scale for volume
+    position_score = (100 - combined_df['position'].to_numpy(dtype=np.float32)) / 100  # higher positions are better
+    difficulty_score = (100 - combined_df['difficulty'].to_numpy(dtype=np.float32)) / 100  # lower difficulty is better
+    cpc_score = np.minimum(combined_df['cpc'].to_numpy(dtype=np.float32) / 5, 1)  # cap at $5 CPC
+    opportunity_scores = (volume_score * VOLUME_WEIGHT +
+                          position_score * POSITION_WEIGHT +
+                          difficulty_score * DIFFICULTY_WEIGHT +
+                          cpc_score * CPC_WEIGHT)
+    combined_df['opportunity_score'] = opportunity_scores
     
     if progress_callback:
         progress_callback(0.6, "Generating analysis results...")
@@ -204,10 +270,10 @@ def analyze_market_opportunity(prospect_domain: str, competitor_domains: List[st
         'summary': {
             'total_keywords': len(combined_df['keyword'].unique()),
             'avg_opportunity_score': combined_df['opportunity_score'].mean(),
-            'high_opportunity_keywords': len(combined_df[combined_df['opportunity_score'] > 0.7])
+            'high_opportunity_keywords': int(np.count_nonzero(opportunity_scores > HIGH_OPPORTUNITY_SCORE))
         },
         'domain_metrics': {},
-        'top_opportunities': combined_df.nlargest(10, 'opportunity_score').to_dict('records'),
+        'top_opportunities': top_records(combined_df, opportunity_scores),
         'keyword_overlap': {},
         'competitive_gaps': {}
     }
@@ -215,26 +281,35 @@ def analyze_market_opportunity(prospect_domain: str, competitor_domains: List[st
     if progress_callback:
         progress_callback(0.7, "Calculating domain-specific metrics...")
     
-    # Calculate domain-specific metrics
-    for domain in [prospect_domain] + competitor_domains:
-        domain_data = combined_df[combined_df['domain'] == domain]
-        results['domain_metrics'][domain] = {
-            'total_keywords': len(domain_data),
-            'avg_position': domain_data['position'].mean(),
-            'total_traffic': domain_data['traffic'].sum(),
-            'avg_difficulty': domain_data['difficulty'].mean()
+    # Calculate domain-specific metrics in a single pass over the data, domains
+    # without any keywords still get a group since they are known categories
+    domain_groups = combined_df.groupby('domain', sort=False, observed=False)
+    domain_metrics = domain_groups.agg(
+        total_keywords=('keyword', 'size'),
+        avg_position=('position', 'mean'),
+        total_traffic=('traffic', 'sum'),
+        avg_difficulty=('difficulty', 'mean')
+    )
+    for row in domain_metrics.itertuples():
+        results['domain_metrics'][row.Index] = {
+            'total_keywords': row.total_keywords,
+            'avg_position': row.avg_position,
+            'total_traffic': row.total_traffic,
+            'avg_difficulty': row.avg_difficulty
         }
     
     if progress_callback:
         progress_callback(0.8, "Calculating keyword overlap...")
     
-    # Calculate keyword overlap
-    all_keywords = set(combined_df['keyword'].unique())
-    prospect_keywords = set(prospect_data['keyword'])
+    # Calculate keyword overlap on hashed indexes of each domain's unique keywords
+    domain_keywords = {
+        domain: pd.Index(keywords)
+        for domain, keywords in domain_groups['keyword'].unique().items()
+    }
+    prospect_keywords = domain_keywords[prospect_domain]
     
     for domain in competitor_domains:
-        comp_keywords = set(combined_df[combined_df['domain'] == domain]['keyword'])
-        overlap = prospect_keywords.intersection(comp_keywords)
+        overlap = prospect_keywords.intersection(domain_keywords[domain])
         results['keyword_overlap'][domain] = {
             'overlap_count': len(overlap),
             'overlap_percentage': len(overlap) / len(prospect_keywords) * 100
@@ -244,17 +319,20 @@ def analyze_market_opportunity(prospect_domain: str, competitor_domains: List[st
         progress_callback(0.9, "Finding competitive gaps...")
     
     # Find competitive gaps (keywords competitors rank for but prospect doesn't)
-    competitor_keywords = set()
-    for domain in competitor_domains:
-        competitor_keywords.update(combined_df[combined_df['domain'] == domain]['keyword'])
-    
-    gaps = competitor_keywords - prospect_keywords
-    if gaps:
+    gaps = reduce(
+        lambda union, comp_gaps: union.union(comp_gaps, sort=False),
+        [domain_keywords[domain].difference(prospect_keywords, sort=False) for domain in competitor_domains],
+        pd.Index([], dtype=object)
+    )
+    if len(gaps):
+        # Match competitor rows on the domain category codes rather than the strings
+        domain_codes = combined_df['domain'].cat.codes.to_numpy()
+        competitor_codes = combined_df['domain'].cat.categories.get_indexer(competitor_domains)
         gap_data = combined_df[
-            (combined_df['keyword'].isin(gaps)) & 
-            (combined_df['domain'].isin(competitor_domains))
+            combined_df['keyword'].isin(gaps).to_numpy() &
+            np.isin(domain_codes, competitor_codes)
         ]
-        results['competitive_gaps'] = gap_data.nlargest(10, 'opportunity_score').to_dict('records')
+        results['competitive_gaps'] = top_records(gap_data, gap_data['opportunity_score'].to_numpy())
     
     if progress_callback:
         progress_callback(1.0, "Analysis complete!")
@@ -0,0 +1,63 @@
+import time
+from utils.rate_limiter import AdaptiveRateLimiter
+
+def test_cooldown_rate_applies_right_after_block():
+    limiter = AdaptiveRateLimiter(calls_per_second=1, cooldown_factor=0.5)
+    limiter.update({'X-RateLimit-Remaining': '50', 'X-RateLimit-Reset': '5'})  # 10 calls/s
+    limiter.penalize(1)
+    start = time.monotonic()
+    times = []
+    for _ in range(4):
+        limiter.acquire()
+        times.append(time.monotonic() - start)
+    # Nothing goes out during the block, then calls are spaced at the
+    # cooldown rate (5/s) instead of bursting out together
+    assert times[0] >= 1
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert all(gap >= 0.18 for gap in gaps)
+
+def test_update_spreads_remaining_quota_over_reset_seconds():
+    limiter = AdaptiveRateLimiter(calls_per_second=1)
+    limiter.update({'X-RateLimit-Remaining': '50', 'X-RateLimit-Reset': '5'})
+    assert limiter.rate == 10
+    assert limiter.capacity == 10
+    assert limiter.blocked_until == 0
+
+def test_update_caps_capacity_by_rate_and_keeps_at_least_one():
+    limiter = AdaptiveRateLimiter(calls_per_second=1)
+    limiter.update({'X-RateLimit-Remaining': '300', 'X-RateLimit-Reset': '60'})
+    assert limiter.rate == 5
+    assert limiter.capacity == 5
+    limiter.update({'X-RateLimit-Remaining': '3', 'X-RateLimit-Reset': '60'})
+    assert limiter.rate == 0.05
+    assert limiter.capacity == 1
+
+def test_update_accepts_epoch_reset():
+    limiter = AdaptiveRateLimiter(calls_per_second=1)
+    limiter.update({'X-RateLimit-Remaining': '20', 'X-RateLimit-Reset': str(time.time() + 10)})
+    assert 1.9 < limiter.rate < 2.1
+    assert 1.9 < limiter.capacity < 2.1
+
+def test_update_blocks_when_quota_is_exhausted():
+    limiter = AdaptiveRateLimiter(calls_per_second=1)
+    before = time.monotonic()
+    limiter.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '30'})
+    after = time.monotonic()
+    assert before + 30 <= limiter.blocked_until <= after + 30
+    assert limiter.tokens == 0
+    assert limiter.last_refill == limiter.blocked_until
+    assert limiter.rate == 1  # the learned rate is kept for after the block
+
+def test_update_blocks_until_epoch_reset():
+    limiter = AdaptiveRateLimiter(calls_per_second=1)
+    before = time.monotonic()
+    limiter.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 30)})
+    after = time.monotonic()
+    assert before + 29 <= limiter.blocked_until <= after + 30
+
+def test_update_ignores_responses_without_rate_limit_headers():
+    limiter = AdaptiveRateLimiter(calls_per_second=2)
+    limiter.update({'X-RateLimit-Reset': '5'})
+    assert limiter.rate == 2
+    assert limiter.capacity == 1
+    assert limiter.blocked_until == 0
@@ -0,0 +1,63 @@
+import requests
+import requests_cache
+from datetime import timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# SE Ranking refreshes keyword data monthly, so a week old page is still good
+RESPONSE_CACHE_NAME = "seranking"
+RESPONSE_CACHE_EXPIRY = timedelta(days=7)
+
+def create_session(pool_size=32, retries=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                   cache_name=None, expire_after=RESPONSE_CACHE_EXPIRY):
+    """
+    Create a requests session that keeps connections alive and retries
+    connection errors and transient server errors with exponential backoff.
+
+    429 responses (and their Retry-After header) are deliberately left to the
+    caller's rate limiter, which pauses every request sharing it instead of
+    sleeping inside a single connection.
+
+    With cache_name set, GET responses are kept in a SQLite cache of that
+    name for expire_after, keyed by URL and params (the Authorization header
+    is left out of the key and never stored). Expired pages are revalidated
+    with ETag / Last-Modified when the API provides them.
+    """
+    if cache_name:
+        session = requests_cache.CachedSession(cache_name, backend="sqlite", expire_after=expire_after)
+    else:
+        session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=status_forcelist,
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+    )
+    session.mount("https://", adapter)
+    return session
+
+def rate_limited_get(session, limiter, url, force_refresh=False, **kwargs):
+    """
+    GET a URL, only waiting on the rate limiter for requests that actually
+    reach the API rather than being answered from the session cache.
+
+    With force_refresh the cache is skipped and the fresh response replaces
+    whatever was cached for the URL.
+    """
+    if isinstance(session, requests_cache.CachedSession):
+        if force_refresh:
+            kwargs['force_refresh'] = True
+        else:
+            response = session.get(url, only_if_cached=True, **kwargs)
+            if response.status_code != 504:  # 504 means the response is not cached
+                return response
+    
+    limiter.acquire()
+    response = session.get(url, **kwargs)
+    limiter.update(response.headers)
+    return response
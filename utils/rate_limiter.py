@@ -1,30 +1,156 @@
 import time
+import asyncio
+import threading
 from functools import wraps
 
 class RateLimiter:
-    def __init__(self, calls_per_second=1):
+    """
+    Token bucket that lets up to `capacity` calls through back to back and
+    refills at `calls_per_second`. Callers only sleep once the bucket is empty.
+    """
+    def __init__(self, calls_per_second=1, capacity=1):
         self.calls_per_second = calls_per_second
-        self.last_call_time = 0
-
-    def wait(self):
-        """Wait if necessary to maintain the rate limit"""
-        current_time = time.time()
-        time_since_last_call = current_time - self.last_call_time
-        time_to_wait = (1.0 / self.calls_per_second) - time_since_last_call
-        
-        if time_to_wait > 0:
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _current_rate(self, now):
+        return self.calls_per_second
+
+    def _refill(self, now):
+        elapsed = max(0, now - self.last_refill)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self._current_rate(now))
+        self.last_refill = now
+
+    def _try_consume(self, now):
+        """Take a token if one is available, otherwise return how long to wait"""
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self._current_rate(now)
+
+    def acquire(self):
+        """Block until a call may be made, then consume a token"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                time_to_wait = self._try_consume(now)
+            if time_to_wait <= 0:
+                return
             time.sleep(time_to_wait)
-        
-        self.last_call_time = time.time()
+
+    async def acquire_async(self):
+        """Like acquire(), but yields to the event loop instead of blocking"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                time_to_wait = self._try_consume(now)
+            if time_to_wait <= 0:
+                return
+            await asyncio.sleep(time_to_wait)
+
+    # Kept for callers written against the old fixed-interval limiter
+    wait = acquire
+
+async def gather_rate_limited(coros, limiter):
+    """Await coroutines concurrently, starting each one only once limiter allows"""
+    async def run(coro):
+        await limiter.acquire_async()
+        return await coro
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+_shared_limiters = {}
+_shared_limiters_lock = threading.Lock()
 
 def rate_limit(calls_per_second=1):
-    """Decorator to rate limit function calls"""
-    limiter = RateLimiter(calls_per_second)
+    """Decorator to rate limit function calls.
+    
+    Every function decorated with the same calls_per_second draws from one
+    process-wide limiter.
+    """
+    with _shared_limiters_lock:
+        limiter = _shared_limiters.setdefault(calls_per_second, RateLimiter(calls_per_second))
     
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            limiter.wait()
+            limiter.acquire()
             return func(*args, **kwargs)
         return wrapper
     return decorator
+
+def _header_number(headers, name):
+    """Read a numeric header value, returning None when missing or malformed"""
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    Token bucket shared by all API calls that follows the rate limit headers
+    returned by the server instead of sleeping a fixed interval per request.
+    """
+    def __init__(self, calls_per_second=1, capacity=1, cooldown=60, cooldown_factor=0.5):
+        super().__init__(calls_per_second, capacity)
+        self.cooldown = cooldown
+        self.cooldown_factor = cooldown_factor
+        self.rate = calls_per_second
+        self.blocked_until = 0
+        self.cooldown_until = 0
+
+    def _current_rate(self, now):
+        if now < self.cooldown_until:
+            return self.rate * self.cooldown_factor
+        return self.rate
+
+    def _refill(self, now):
+        if now < self.blocked_until:
+            # Keep the refill clock at the end of the block; see penalize()
+            return
+        super()._refill(now)
+
+    def _try_consume(self, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return super()._try_consume(now)
+
+    def update(self, headers):
+        """Sync the bucket with the X-RateLimit-* headers of a response"""
+        remaining = _header_number(headers, 'X-RateLimit-Remaining')
+        if remaining is None:
+            return
+        reset = _header_number(headers, 'X-RateLimit-Reset')
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if reset is not None and reset > 1e9:
+                # Reset given as a unix timestamp rather than seconds from now,
+                # the only place the wall clock is needed
+                reset = max(0, reset - time.time())
+            if remaining <= 0:
+                if reset:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+                    self.last_refill = max(self.last_refill, self.blocked_until)
+                self.tokens = 0
+                return
+            if reset:
+                # Spread what is left of the quota over the rest of the window
+                self.rate = remaining / reset
+                self.capacity = max(1, min(remaining, self.rate))
+            self.tokens = min(self.tokens, remaining)
+
+    def penalize(self, retry_after):
+        """Pause all callers for retry_after seconds and slow down for a while after"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            # No tokens accrue while blocked, so the block ends on an empty
+            # bucket refilling at the cooldown rate rather than with a burst
+            self.last_refill = max(self.last_refill, self.blocked_until)
+            self.cooldown_until = self.blocked_until + self.cooldown
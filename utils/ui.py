@@ -0,0 +1,54 @@
+import os
+import time
+import streamlit as st
+
+# .env at the project root, next to streamlit_app.py
+ENV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+
+def init_session_state():
+    """Initialize session state variables"""
+    if 'authenticated' not in st.session_state:
+        st.session_state.authenticated = False
+    if 'analysis_results' not in st.session_state:
+        st.session_state.analysis_results = None
+    if 'competitors' not in st.session_state:
+        st.session_state.competitors = []
+    if 'competitors_set' not in st.session_state:
+        # Mirrors competitors for O(1) membership checks, the list keeps the order
+        st.session_state.competitors_set = set(st.session_state.competitors)
+    if 'new_competitor' not in st.session_state:
+        st.session_state.new_competitor = ""
+
+def add_competitor():
+    """Add a new competitor to the list"""
+    competitor = st.session_state.new_competitor
+    if competitor:
+        if competitor not in st.session_state.competitors_set:
+            st.session_state.competitors.append(competitor)
+            st.session_state.competitors_set.add(competitor)
+        st.session_state.new_competitor = ""
+
+def remove_competitor(competitor):
+    """Remove a competitor from the list"""
+    st.session_state.competitors.remove(competitor)
+    st.session_state.competitors_set.discard(competitor)
+
+def display_metric_card(title, value, description=""):
+    """Display a metric with its description as a tooltip"""
+    st.metric(label=title, value=value, help=description)
+
+class ThrottledProgress:
+    """Progress callback that redraws the bar and its text at most hz times a second"""
+    def __init__(self, bar, text, hz=5):
+        self.bar = bar
+        self.text = text
+        self._period = 1 / hz
+        self._last = 0
+
+    def __call__(self, progress, message):
+        now = time.monotonic()
+        # Always show completion, whatever the time since the last redraw
+        if now - self._last >= self._period or progress >= 1.0:
+            self.bar.progress(progress)
+            self.text.text(message)
+            self._last = now
@@ -0,0 +1,93 @@
+import streamlit as st
+import os
+from typing import Tuple
+from utils.ui import add_competitor, remove_competitor, ThrottledProgress
+
+@st.cache_data(ttl=24 * 60 * 60, show_spinner=False)
+def _run_moe(prospect: str, competitors: Tuple[str, ...], _force_refresh: bool = False) -> dict:
+    """Run the market analysis, memoized per (prospect, competitors) for a day.
+    
+    _force_refresh is left out of the cache key, a refreshed run replaces the
+    cached result for the same inputs.
+    """
+    # Imported here so pages that never run an analysis don't pay for it
+    from moe_algorithm import analyze_market_opportunity
+    
+    progress_text = st.empty()
+    progress_bar = st.progress(0)
+    
+    try:
+        return analyze_market_opportunity(
+            prospect,
+            list(competitors),
+            progress_callback=ThrottledProgress(progress_bar, progress_text),
+            force_refresh=_force_refresh
+        )
+    finally:
+        progress_bar.empty()
+        progress_text.empty()
+
+def analysis_page():
+    """Render the analysis page"""
+    st.title("Market Analysis")
+    st.subheader("Configure Analysis Parameters")
+    
+    # Domain input
+    prospect_domain = st.text_input(
+        "Enter your domain:",
+        help="Enter the domain you want to analyze (e.g., example.com)"
+    )
+    
+    # Competitor management
+    st.subheader("Manage Competitors")
+    
+    # Add competitor
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.text_input(
+            "Add competitor domain:",
+            key="new_competitor",
+            help="Enter a competitor's domain (e.g., competitor.com)"
+        )
+    with col2:
+        st.button("Add", on_click=add_competitor)
+    
+    # List competitors
+    if st.session_state.competitors:
+        st.write("Current competitors:")
+        for comp in st.session_state.competitors:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.write(comp)
+            with col2:
+                st.button("Remove", key=f"remove_{comp}", on_click=remove_competitor, args=(comp,))
+    
+    force_refresh = st.checkbox(
+        "Force refresh",
+        help="Ignore cached results and fetch fresh data from SE Ranking"
+    )
+    
+    # Run analysis button
+    if st.button("Run Analysis", disabled=not (prospect_domain and st.session_state.competitors)):
+        if not os.getenv('SE_RANKING_API_KEY'):
+            st.error("Please set your SE Ranking API key in the Settings page first.")
+            return
+        
+        competitors = tuple(st.session_state.competitors)
+        if force_refresh:
+            _run_moe.clear(prospect_domain, competitors)
+        
+        try:
+            # Run the analysis
+            results = _run_moe(prospect_domain, competitors, _force_refresh=force_refresh)
+            
+            # Store results in session state
+            st.session_state.analysis_results = results
+            
+            # Navigate to results page
+            st.switch_page("views/results.py")
+            
+        except Exception as e:
+            st.error(f"An unexpected error occurred: {str(e)}")
+
+analysis_page()
@@ -0,0 +1,21 @@
+import streamlit as st
+
+def home_page():
+    """Render the home page"""
+    st.title("Market Opportunity Engine")
+    st.subheader("Welcome to your SEO and Market Analysis Dashboard")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("### Quick Actions")
+        if st.button("New Analysis"):
+            st.switch_page("views/analysis.py")
+        if st.button("View Recent Reports"):
+            st.info("Recent reports feature coming soon!")
+    
+    with col2:
+        st.markdown("### Recent Activity")
+        st.info("Activity feed coming soon!")
+
+home_page()
@@ -0,0 +1,121 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from utils.ui import display_metric_card
+
+# Shared Plotly config, charts also get stable keys so reruns update them in place
+PLOTLY_CONFIG = {"displaylogo": False, "responsive": True}
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _build_radar(domain_metrics: dict) -> go.Figure:
+    """Radar chart comparing the domains, built once per set of metrics"""
+    metrics_df = pd.DataFrame.from_dict(domain_metrics, orient='index')
+    
+    # Create radar chart for domain comparison
+    metrics = ['avg_position', 'total_traffic', 'avg_difficulty']
+    radar_values = metrics_df.reindex(columns=metrics).to_numpy()
+    
+    fig = go.Figure()
+    for i, domain in enumerate(metrics_df.index):
+        fig.add_trace(go.Scatterpolar(
+            r=radar_values[i],
+            theta=metrics,
+            fill='toself',
+            name=domain
+        ))
+    
+    fig.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
+        showlegend=True
+    )
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _build_overlap(overlap_data: dict) -> go.Figure:
+    """Bar chart of keyword overlap with the prospect, built once per result"""
+    overlap_df = pd.DataFrame.from_dict(overlap_data, orient='index')
+    
+    return px.bar(
+        overlap_df,
+        y='overlap_percentage',
+        title="Keyword Overlap with Prospect Domain"
+    )
+
+def results_page():
+    """Render the results page"""
+    if st.session_state.analysis_results is None:
+        st.warning("No analysis results available. Please run an analysis first.")
+        return
+
+    st.title("Analysis Results")
+    results = st.session_state.analysis_results
+    
+    # Summary Section
+    st.header("Summary")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        display_metric_card(
+            "Total Keywords",
+            results['summary']['total_keywords'],
+            "Unique keywords across all domains"
+        )
+    with col2:
+        display_metric_card(
+            "Opportunity Score",
+            f"{results['summary']['avg_opportunity_score']:.2f}",
+            "Average opportunity score"
+        )
+    with col3:
+        display_metric_card(
+            "High Opportunity Keywords",
+            results['summary']['high_opportunity_keywords'],
+            "Keywords with score > 0.7"
+        )
+    
+    # Only the selected section is built, so charts and tables the user
+    # hasn't asked for are never constructed or sent to the browser
+    section = st.radio(
+        "Section",
+        ["Domain Comparison", "Top Opportunities", "Keyword Overlap", "Competitive Gaps"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="results_section"
+    )
+    
+    if section == "Domain Comparison":
+        # Domain Metrics
+        st.header("Domain Comparison")
+        st.plotly_chart(
+            _build_radar(results['domain_metrics']),
+            key="radar_domain",
+            use_container_width=True,
+            config=PLOTLY_CONFIG
+        )
+    
+    elif section == "Top Opportunities":
+        # Top Opportunities
+        st.header("Top Opportunities")
+        top_opportunities_df = pd.DataFrame(results['top_opportunities'])
+        st.dataframe(top_opportunities_df)
+    
+    elif section == "Keyword Overlap":
+        # Keyword Overlap
+        st.header("Keyword Overlap")
+        st.plotly_chart(
+            _build_overlap(results['keyword_overlap']),
+            key="overlap_bar",
+            use_container_width=True,
+            config=PLOTLY_CONFIG
+        )
+    
+    elif section == "Competitive Gaps":
+        # Competitive Gaps
+        st.header("Competitive Gaps")
+        if results['competitive_gaps']:
+            gaps_df = pd.DataFrame(results['competitive_gaps'])
+            st.dataframe(gaps_df)
+        else:
+            st.info("No significant competitive gaps found.")
+
+results_page()
@@ -0,0 +1,100 @@
+import streamlit as st
+import os
+import hashlib
+import requests
+from dotenv import set_key
+from utils.http_session import create_session
+from utils.ui import ENV_PATH
+
+@st.cache_resource
+def _se_session() -> requests.Session:
+    """Pooled keep-alive session shared by every SE Ranking call from the UI"""
+    session = create_session(pool_size=16, retries=2, backoff_factor=0.2)
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+@st.cache_resource
+def _key_salt() -> bytes:
+    """Random key for digesting API keys, fixed for the life of the server process"""
+    return os.urandom(16)
+
+def _key_digest(api_key: str) -> str:
+    return hashlib.blake2s(api_key.encode(), key=_key_salt(), digest_size=16).hexdigest()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _verify_cached(key_digest: str, _api_key: str) -> bool:
+    """Verify an API key, memoized for five minutes per key digest.
+    
+    The key itself is left out of the cache hash (leading underscore), so
+    cache entries are only ever keyed by the salted digest.
+    """
+    response = _se_session().get(
+        "https://api4.seranking.com/research/us/overview/",
+        params={"domain": "example.com"},
+        headers={"Authorization": _api_key},
+        timeout=10
+    )
+    if response.status_code == 429:
+        retry_after = int(response.headers.get('Retry-After', 600))
+        raise RuntimeError(f"Rate limit exceeded. Please try again in {retry_after} seconds.")
+    # Only an auth rejection means the key is bad, server errors that outlast
+    # the session's retries come back as responses and must not be cached
+    if response.status_code not in (200, 401, 403):
+        response.raise_for_status()
+    return response.status_code == 200
+
+def verify_api_key(api_key: str) -> bool:
+    """Verify SE Rankings API key, memoized for five minutes per key.
+    
+    Rate limiting and network failures raise instead of returning False so
+    that a transient error is never cached as an invalid key.
+    """
+    return _verify_cached(_key_digest(api_key), api_key)
+
+def settings_page():
+    """Render the settings page"""
+    st.title("Settings")
+    st.subheader("Configure Your Analysis Parameters")
+    
+    # Load current API key. It is seeded through session state rather than
+    # value= so that saving a new key doesn't reset what is being typed
+    if 'api_key_input' not in st.session_state:
+        st.session_state.api_key_input = os.getenv('SE_RANKING_API_KEY', '')
+    
+    # API Key input
+    api_key = st.text_input(
+        "SE Ranking API Key:",
+        type="password",
+        key="api_key_input",
+        help="Enter your SE Ranking API key. This is required for fetching domain keyword data."
+    )
+    
+    # Save settings
+    if st.button("Save Settings"):
+        try:
+            # Update the key in .env in place, keeping any other entries
+            open(ENV_PATH, 'a').close()
+            set_key(ENV_PATH, 'SE_RANKING_API_KEY', api_key, quote_mode='never')
+            os.environ['SE_RANKING_API_KEY'] = api_key
+            
+            st.success("Settings saved successfully! API key has been updated.")
+            
+            # Verify API key works
+            if api_key:
+                with st.spinner("Verifying API key..."):
+                    try:
+                        verified = verify_api_key(api_key)
+                    except RuntimeError as e:
+                        st.warning(str(e))
+                    except requests.exceptions.RequestException as e:
+                        st.error(f"API request failed: {str(e)}")
+                    else:
+                        if verified:
+                            st.success("API key verified successfully!")
+                        else:
+                            st.error("Invalid API key. Please check your credentials.")
+        
+        except Exception as e:
+            st.error(f"Error saving settings: {str(e)}")
+
+settings_page()